@@ -28,8 +28,8 @@ def analyze_training_dataset(profile, config, simulator=None):
         'benchmark': Path("out") / profile / "benchmark",
     }
     
-    dataset_path = out_path / "dataset.csv"
-    pairs_path = out_path / "pairs.csv"
+    dataset_path = out_path / "dataset.parquet"
+    pairs_path = out_path / "pairs.parquet"
     
     # Create the data managers
     dataset_manager = DatasetManager(dataset_path, out_paths, simulator)
@@ -221,8 +221,8 @@ def main():
 
     # Setup paths
     out_path, out_paths = setup_paths(profile, config)
-    dataset_path = out_path / "dataset.csv"
-    pairs_path = out_path / "pairs.csv"
+    dataset_path = out_path / "dataset.parquet"
+    pairs_path = out_path / "pairs.parquet"
 
     # Main loop
     loader = profile_module.Loader()
@@ -1,8 +1,38 @@
+import csv
+import os
+import numpy as np
 import pandas as pd
-from typing import List, Any, Optional, Tuple, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Any, Dict, Optional, Tuple, Iterator
 from pathlib import Path
 
 
+# Arrow-backed string storage: hashes/paths live in a contiguous buffer instead of
+# one PyObject per value, and equality/isin scans run through Arrow kernels
+_STRING_DTYPE = 'string[pyarrow]'
+
+
+def _empty_pairs_df() -> pd.DataFrame:
+    """Create an empty pairs DataFrame with a float64 winner column.
+
+    A bare pd.DataFrame(columns=...) would give every column object dtype, and the
+    object winner column would then force the slow object kernels on every isna/notna.
+    """
+    return pd.DataFrame({
+        'hash1': pd.Series([], dtype=_STRING_DTYPE),
+        'hash2': pd.Series([], dtype=_STRING_DTYPE),
+        'winner': pd.Series([], dtype='float64'),
+    })
+
+
+def _atomic_write(df: pd.DataFrame, path) -> None:
+    """Write a DataFrame to a Parquet file atomically (temp file + os.replace)."""
+    tmp_path = str(path) + '.tmp'
+    df.to_parquet(tmp_path, index=False, compression='zstd')
+    os.replace(tmp_path, path)
+
+
 class DatasetManager:
     """
     Manages the dataset of simulation parameters, outputs, and videos.
@@ -12,65 +42,156 @@ class DatasetManager:
     - Outputs (stored in out/outputs/)
     - Videos (stored in out/videos/)
     
-    It maintains a CSV file (dataset.csv) with columns:
+    It maintains a Parquet file (dataset.parquet) with columns:
     hash,param_path,output_path,video_path
     """
-    
+
+    # New rows buffer in a plain list and are folded into the DataFrame in one
+    # concat once this many are pending (or on save/read)
+    _PENDING_BATCH_SIZE = 256
+
+    # Column positions in data_df, for positional writes via .iat
+    _COL_PARAM, _COL_OUTPUT, _COL_VIDEO = 1, 2, 3
+
     def __init__(self, dataset_path: str, out_paths: dict, simulator=None):
         """
         Initialize the DatasetManager.
-        
+
         Args:
-            dataset_path: Path to the dataset CSV file
+            dataset_path: Path to the dataset Parquet file
             out_paths: Dictionary containing paths to various output directories
             simulator: Optional simulator instance for loading data
         """
         self.dataset_path = dataset_path
         self.out_paths = out_paths
         self.simulator = simulator
+        self._dirty = False
+        self._autosave = True
+        self._pending_rows = []
+        self._pending_pos = {}
+        # Append journal: new rows since the last full Parquet write, so that the
+        # common add-only save is O(rows added) instead of O(dataset size)
+        self._journal_path = str(dataset_path) + '.journal.csv'
+        self._unjournaled_rows = {}
+        self._needs_full_write = False
         self.data_df = self._load_or_create_dataset()
         
     def _load_or_create_dataset(self) -> pd.DataFrame:
-        """Load the dataset from CSV or create a new one if it doesn't exist."""
-        if Path(self.dataset_path).exists():
-            return pd.read_csv(self.dataset_path, dtype=str)
+        """Load the dataset from disk or create a new one if it doesn't exist."""
+        dataset_path = Path(self.dataset_path)
+        legacy_csv_path = dataset_path.with_suffix('.csv')
+        journal_path = Path(self._journal_path)
+        if dataset_path.exists():
+            df = pd.read_parquet(dataset_path).astype(_STRING_DTYPE)
+            if journal_path.exists():
+                # Fold rows appended since the last full write back in and compact
+                journal_df = pd.read_csv(
+                    journal_path, header=None,
+                    names=['hash', 'param_path', 'output_path', 'video_path'], dtype=str
+                ).astype(_STRING_DTYPE)
+                df = pd.concat([df, journal_df], ignore_index=True) \
+                    .drop_duplicates(subset='hash', keep='last', ignore_index=True)
+                _atomic_write(df, dataset_path)
+                journal_path.unlink()
+        elif legacy_csv_path.exists():
+            # Migrate a dataset saved in the legacy CSV format
+            df = pd.read_csv(legacy_csv_path, dtype=str).astype(_STRING_DTYPE)
+            _atomic_write(df, dataset_path)
         else:
             # Create a new dataset with the required columns
-            df = pd.DataFrame(columns=['hash', 'param_path', 'output_path', 'video_path'])
-            df.to_csv(self.dataset_path, index=False)
-            return df
-    
+            df = pd.DataFrame(columns=['hash', 'param_path', 'output_path', 'video_path']).astype(_STRING_DTYPE)
+            _atomic_write(df, dataset_path)
+
+        # Index mapping hash -> (param_path, output_path, video_path) for O(1) lookups,
+        # and hash -> row position for O(1) in-place updates
+        self._index = dict(zip(df['hash'], zip(df['param_path'], df['output_path'], df['video_path'])))
+        self._row_pos = {hash_value: pos for pos, hash_value in enumerate(df['hash'])}
+        return df
+
+    def _consolidate_pending(self):
+        """Fold any buffered new rows into the DataFrame with a single concat."""
+        if self._pending_rows:
+            start_pos = len(self.data_df)
+            for offset, row in enumerate(self._pending_rows):
+                self._row_pos[row['hash']] = start_pos + offset
+            self.data_df = pd.concat(
+                [self.data_df, pd.DataFrame(self._pending_rows).astype(_STRING_DTYPE)],
+                ignore_index=True
+            ).copy()  # copy() rechunks the block manager after the bulk append
+            self._pending_rows.clear()
+            self._pending_pos.clear()
+
+    def _full_write(self):
+        """Rewrite the whole Parquet file and drop the now-redundant append journal."""
+        self._consolidate_pending()
+        _atomic_write(self.data_df, self.dataset_path)
+        Path(self._journal_path).unlink(missing_ok=True)
+        self._unjournaled_rows.clear()
+        self._needs_full_write = False
+
     def save(self):
-        """Save the dataset to the CSV file."""
-        self.data_df.to_csv(self.dataset_path, index=False)
+        """Save the dataset, if there are unsaved changes.
+
+        New rows are appended to a CSV journal next to the Parquet file, so the
+        common add-only save costs O(rows added); the journal is compacted back
+        into the Parquet file on load, on flush, and whenever an existing row
+        changed and a full rewrite is needed anyway.
+        """
+        if not (self._dirty and self._autosave):
+            return
+        if self._needs_full_write or not Path(self.dataset_path).exists():
+            self._full_write()
+        elif self._unjournaled_rows:
+            with open(self._journal_path, 'a', newline='') as journal_file:
+                writer = csv.writer(journal_file)
+                for hash_value, paths in self._unjournaled_rows.items():
+                    writer.writerow([hash_value, *paths])
+            self._unjournaled_rows.clear()
+        self._dirty = False
+
+    def flush(self):
+        """Write any unsaved changes to disk, regardless of the autosave setting."""
+        if self._dirty:
+            self._full_write()
+            self._dirty = False
+
+    @contextmanager
+    def batch(self):
+        """Context manager suppressing intermediate saves; writes once on exit."""
+        self._autosave = False
+        try:
+            yield self
+        finally:
+            self._autosave = True
+            self.save()
     
     def reset(self):
         """
         Reset the dataset by deleting all files and clearing the dataframe.
         """
         # Get all file paths
-        all_param_files = []
-        all_output_files = []
-        all_video_files = []
-        
-        for _, row in self.data_df.iterrows():
-            if Path(row['param_path']).exists():
-                all_param_files.append(row['param_path'])
-            if Path(row['output_path']).exists():
-                all_output_files.append(row['output_path'])
-            if Path(row['video_path']).exists():
-                all_video_files.append(row['video_path'])
-                
-        # Delete all files
-        for file_path in all_param_files + all_output_files + all_video_files:
+        self._consolidate_pending()
+        all_files = self.data_df[['param_path', 'output_path', 'video_path']].to_numpy().ravel().tolist()
+
+        # Delete all files, issuing the unlinks concurrently to amortize disk latency
+        def delete_file(file_path):
             try:
-                Path(file_path).unlink()
-            except (OSError, FileNotFoundError):
-                pass  # Ignore errors if file doesn't exist or can't be deleted
+                Path(file_path).unlink(missing_ok=True)
+            except OSError:
+                pass  # Ignore errors if the file can't be deleted
+
+        if all_files:
+            with ThreadPoolExecutor(max_workers=min(32, len(all_files))) as executor:
+                list(executor.map(delete_file, all_files))
                 
-        # Reset the dataframe
-        self.data_df = pd.DataFrame(columns=['hash', 'param_path', 'output_path', 'video_path'])
-        
+        # Reset the dataframe and the hash indexes
+        self.data_df = pd.DataFrame(columns=['hash', 'param_path', 'output_path', 'video_path']).astype(_STRING_DTYPE)
+        self._index = {}
+        self._row_pos = {}
+        self._unjournaled_rows.clear()
+        self._needs_full_write = True
+        self._dirty = True
+
         # Save the empty dataframe
         self.save()
     
@@ -85,53 +206,57 @@ class DatasetManager:
             video_path: Path to the saved video
         """
         # Check if the hash already exists
-        if hash_value in self.data_df['hash'].values:
-            # Update the existing entry
-            self.data_df.loc[self.data_df['hash'] == hash_value, 'param_path'] = param_path
-            self.data_df.loc[self.data_df['hash'] == hash_value, 'output_path'] = output_path
-            self.data_df.loc[self.data_df['hash'] == hash_value, 'video_path'] = video_path
+        if hash_value in self._index:
+            # Update the existing entry, which may still be in the pending buffer
+            if hash_value in self._pending_pos:
+                row = self._pending_rows[self._pending_pos[hash_value]]
+                row['param_path'], row['output_path'], row['video_path'] = param_path, output_path, video_path
+            else:
+                pos = self._row_pos[hash_value]
+                self.data_df.iat[pos, self._COL_PARAM] = param_path
+                self.data_df.iat[pos, self._COL_OUTPUT] = output_path
+                self.data_df.iat[pos, self._COL_VIDEO] = video_path
+            if hash_value in self._unjournaled_rows:
+                # Row not journaled yet: refresh it in place
+                self._unjournaled_rows[hash_value] = (param_path, output_path, video_path)
+            else:
+                self._needs_full_write = True
         else:
-            # Add a new entry
-            new_entry = pd.DataFrame({
-                'hash': [hash_value],
-                'param_path': [param_path],
-                'output_path': [output_path],
-                'video_path': [video_path]
+            # Buffer the new entry instead of concatenating one row at a time
+            self._pending_pos[hash_value] = len(self._pending_rows)
+            self._pending_rows.append({
+                'hash': hash_value,
+                'param_path': param_path,
+                'output_path': output_path,
+                'video_path': video_path
             })
-            self.data_df = pd.concat([self.data_df, new_entry], ignore_index=True)
-        
+            if len(self._pending_rows) >= self._PENDING_BATCH_SIZE:
+                self._consolidate_pending()
+            self._unjournaled_rows[hash_value] = (param_path, output_path, video_path)
+        self._index[hash_value] = (param_path, output_path, video_path)
+        self._dirty = True
+
         # Save the updated dataset
         self.save()
     
+    def _get_indexed_paths(self, hash_values: List[str], position: int) -> List[Optional[str]]:
+        """Resolve one of the (param, output, video) path columns for a list of hashes via the index."""
+        try:
+            return [self._index[hash_value][position] for hash_value in hash_values]
+        except KeyError as e:
+            raise ValueError(f"Hash {e.args[0]} not found in dataset") from None
+
     def get_param_paths(self, hash_values: List[str]) -> List[Optional[str]]:
         """Get the paths to the parameters for a list of hashes."""
-        param_paths = []
-        for hash_value in hash_values:
-            if hash_value in self.data_df['hash'].values:
-                param_paths.append(self.data_df.loc[self.data_df['hash'] == hash_value, 'param_path'].iloc[0])
-            else:
-                raise ValueError(f"Hash {hash_value} not found in dataset")
-        return param_paths
-    
+        return self._get_indexed_paths(hash_values, 0)
+
     def get_output_paths(self, hash_values: List[str]) -> List[Optional[str]]:
         """Get the paths to the outputs for a list of hashes."""
-        output_paths = []
-        for hash_value in hash_values:
-            if hash_value in self.data_df['hash'].values:
-                output_paths.append(self.data_df.loc[self.data_df['hash'] == hash_value, 'output_path'].iloc[0])
-            else:
-                raise ValueError(f"Hash {hash_value} not found in dataset")
-        return output_paths
-    
+        return self._get_indexed_paths(hash_values, 1)
+
     def get_video_paths(self, hash_values: List[str]) -> List[Optional[str]]:
         """Get the paths to the videos for a list of hashes."""
-        video_paths = []
-        for hash_value in hash_values:
-            if hash_value in self.data_df['hash'].values:
-                video_paths.append(self.data_df.loc[self.data_df['hash'] == hash_value, 'video_path'].iloc[0])
-            else:
-                raise ValueError(f"Hash {hash_value} not found in dataset")
-        return video_paths
+        return self._get_indexed_paths(hash_values, 2)
     
     def load_param(self, hash_value: str) -> Any:
         """
@@ -161,7 +286,11 @@ class DatasetManager:
         Returns:
             List of loaded parameters
         """
-        return [self.load_param(hash_value) for hash_value in hash_values if self.get_param_paths([hash_value])[0]]
+        if not self.simulator:
+            raise ValueError("Simulator not provided to DatasetManager. Cannot load parameters.")
+
+        param_paths = self.get_param_paths(hash_values)
+        return [self.simulator.load_param(param_path) for param_path in param_paths if param_path]
     
     def load_output(self, hash_value: str) -> Any:
         """
@@ -173,10 +302,12 @@ class DatasetManager:
         """
         Load multiple outputs for given hashes.
         """
-        return [self.load_output(hash_value) for hash_value in hash_values if self.get_output_paths([hash_value])[0]]
+        output_paths = self.get_output_paths(hash_values)
+        return [self.simulator.load_output(output_path) for output_path in output_paths if output_path]
 
     def get_all_hashes(self) -> List[str]:
         """Get all hash values in the dataset."""
+        self._consolidate_pending()
         return self.data_df['hash'].tolist()
     
     def add_entries_from_simulation(self, hashs: List[str], params: List[Any], 
@@ -193,19 +324,52 @@ class DatasetManager:
             output_paths: List of paths to saved outputs
             video_paths: List of paths to saved videos
         """
+        # Split the batch into updates of existing rows and brand new rows, so that
+        # the DataFrame is grown by a single concat and the file written only once.
+        self._consolidate_pending()
+        path_col_pos = [self._COL_PARAM, self._COL_OUTPUT, self._COL_VIDEO]
+        new_rows = {'hash': [], 'param_path': [], 'output_path': [], 'video_path': []}
+        pending_pos = {}
+
         for i, hash_value in enumerate(hashs):
-            self.add_entry(
-                hash_value=str(hash_value),
-                param_path=param_paths[i],
-                output_path=output_paths[i],
-                video_path=video_paths[i]
-            )
+            hash_value = str(hash_value)
+            paths = (param_paths[i], output_paths[i], video_paths[i])
+            if hash_value in self._row_pos:
+                # Update the existing row in place
+                self.data_df.iloc[self._row_pos[hash_value], path_col_pos] = paths
+                if hash_value in self._unjournaled_rows:
+                    self._unjournaled_rows[hash_value] = paths
+                else:
+                    self._needs_full_write = True
+            elif hash_value in pending_pos:
+                # Duplicate hash within the batch: overwrite the pending row
+                pos = pending_pos[hash_value]
+                for col, value in zip(('param_path', 'output_path', 'video_path'), paths):
+                    new_rows[col][pos] = value
+                self._unjournaled_rows[hash_value] = paths
+            else:
+                pending_pos[hash_value] = len(new_rows['hash'])
+                new_rows['hash'].append(hash_value)
+                for col, value in zip(('param_path', 'output_path', 'video_path'), paths):
+                    new_rows[col].append(value)
+                self._unjournaled_rows[hash_value] = paths
+            self._index[hash_value] = paths
+
+        if new_rows['hash']:
+            start_pos = len(self.data_df)
+            for offset, hash_value in enumerate(new_rows['hash']):
+                self._row_pos[hash_value] = start_pos + offset
+            self.data_df = pd.concat([self.data_df, pd.DataFrame(new_rows).astype(_STRING_DTYPE)], ignore_index=True)
+
+        if len(hashs) > 0:
+            self._dirty = True
+        self.save()
 
     def __len__(self) -> int:
         """
         Get the number of entries in the dataset.
         """
-        return len(self.data_df)
+        return len(self.data_df) + len(self._pending_rows)
 
 
 class PairsManager:
@@ -216,43 +380,71 @@ class PairsManager:
     - Unranked pairs (where winner is empty)
     - Ranked pairs (where winner is filled)
     
-    It maintains a CSV file (pairs.csv) with columns:
+    It maintains a Parquet file (pairs.parquet) with columns:
     hash1,hash2,winner
     """
-    
+
+    # Above this many input pairs, add_pairs updates existing rows through
+    # DataFrame merges instead of per-pair dict lookups
+    _MERGE_BATCH_THRESHOLD = 10_000
+
     def __init__(self, pairs_path: str):
         """
         Initialize the PairsManager.
-        
+
         Args:
-            pairs_path: Path to the pairs CSV file
+            pairs_path: Path to the pairs Parquet file
             dataset_manager: Optional DatasetManager instance for loading data
         """
         self.pairs_path = pairs_path
+        self._dirty = False
+        self._autosave = True
+        self._reindex_dirty = False
         self._load_or_create_pairs()
-        
+
     def _load_or_create_pairs(self) -> None:
-        """Load the pairs from CSV or create a new one if it doesn't exist."""
-        if Path(self.pairs_path).exists():
-            self.pairs_df = pd.read_csv(self.pairs_path, dtype={'hash1': str, 'hash2': str, 'winner': float})
+        """Load the pairs from disk or create a new one if it doesn't exist."""
+        pairs_path = Path(self.pairs_path)
+        legacy_csv_path = pairs_path.with_suffix('.csv')
+        hash_dtypes = {'hash1': _STRING_DTYPE, 'hash2': _STRING_DTYPE}
+        if pairs_path.exists():
+            self.pairs_df = pd.read_parquet(pairs_path).astype(hash_dtypes)
+        elif legacy_csv_path.exists():
+            # Migrate a pairs file saved in the legacy CSV format
+            self.pairs_df = pd.read_csv(legacy_csv_path, dtype={'hash1': str, 'hash2': str, 'winner': float}) \
+                .astype(hash_dtypes)
+            self._dirty = True
         else:
             # Create a new pairs file with the required columns
-            self.pairs_df = pd.DataFrame(columns=['hash1', 'hash2', 'winner'])
+            self.pairs_df = _empty_pairs_df()
+            self._dirty = True
+        self._rebuild_pair_index()
         self.save()
 
+    def _rebuild_pair_index(self) -> None:
+        """Rebuild the dict mapping canonical (hash1, hash2) keys to row positions."""
+        hash1_arr = self.pairs_df['hash1'].to_numpy()
+        hash2_arr = self.pairs_df['hash2'].to_numpy()
+        low = np.minimum(hash1_arr, hash2_arr)
+        high = np.maximum(hash1_arr, hash2_arr)
+        self._pair_idx = {key: idx for idx, key in enumerate(zip(low, high))}
+
     def reset(self):
         """
         Reset the pairs manager by clearing all pairs and saving an empty pairs file.
         """
-        self.pairs_df = pd.DataFrame(columns=['hash1', 'hash2', 'winner'])
+        self.pairs_df = _empty_pairs_df()
+        self._pair_idx = {}
+        self._dirty = True
         self.save()
-        
+
     def reset_rankings(self):
         """
         Reset only the rankings by clearing all winners but keeping the pairs.
         This preserves the pairs structure but marks them all as unranked.
         """
-        self.pairs_df['winner'] = None
+        self.pairs_df['winner'] = np.nan
+        self._dirty = True
         self.save()
 
     def _reindex_pairs(self):
@@ -260,53 +452,62 @@ class PairsManager:
         Reorders the unranked pairs such that no hash appears n+1 times until all other hashes
         have appeared n times. This ensures users encounter a diverse range of simulations.
         """
-        unranked_pairs = self.pairs_df[self.pairs_df['winner'].isna()].copy()
+        unranked_pairs = self.pairs_df[self.pairs_df['winner'].isna()].reset_index(drop=True)
 
-        # Create a copy to avoid modifying the original
-        pairs = unranked_pairs.copy().reset_index(drop=True)
-        
-        # Initialize the count dictionary for all unique hashes
-        all_hashes = pd.concat([pairs['hash1'], pairs['hash2']]).unique()
-        hash_counts = {hash_val: 0 for hash_val in all_hashes}
-        
-        # Initialize the result dataframe
-        ordered_pairs = pd.DataFrame(columns=pairs.columns)
-        
-        # Continue until all pairs are used
-        remaining_pairs = pairs.copy()
-        
-        ordered_rows = []
-        while not remaining_pairs.empty:
-            scores_h1 = remaining_pairs['hash1'].map(hash_counts)
-            scores_h2 = remaining_pairs['hash2'].map(hash_counts)
-            remaining_pairs['_score'] = scores_h1 + scores_h2
-
-            min_score_val = remaining_pairs['_score'].min()
-            
-            # Filter to pairs that have the minimum score
-            min_score_pairs_df = remaining_pairs[remaining_pairs['_score'] == min_score_val]
-            chosen_pair_series = min_score_pairs_df.sample(n=1).iloc[0]
-            ordered_rows.append(chosen_pair_series[pairs.columns]) 
-            
-            # Update the hash counts for the hashes in the chosen pair
-            hash_counts[chosen_pair_series['hash1']] += 1 
-            hash_counts[chosen_pair_series['hash2']] += 1
-            remaining_pairs = remaining_pairs.drop(chosen_pair_series.name)
-        
-        # After the loop, create the ordered_pairs DataFrame from the list of rows
-        if ordered_rows:
-            # Construct DataFrame from list of Series; ensure correct columns and order
-            ordered_pairs = pd.DataFrame(ordered_rows, columns=pairs.columns).reset_index(drop=True)
+        if unranked_pairs.empty:
+            ordered_pairs = unranked_pairs
         else:
-            # If no unranked pairs, create an empty DataFrame with the correct columns
-            ordered_pairs = pd.DataFrame(columns=pairs.columns)
-        
-        self.pairs_df = pd.concat([pd.DataFrame(ordered_pairs), self.pairs_df[self.pairs_df['winner'].notna()]], ignore_index=True).reset_index(drop=True)
+            # Work on integer hash indices and a flat count array instead of
+            # per-iteration Series allocations
+            all_hashes = pd.concat([unranked_pairs['hash1'], unranked_pairs['hash2']]).unique()
+            hash_to_idx = {hash_val: idx for idx, hash_val in enumerate(all_hashes)}
+            h1 = np.array([hash_to_idx[hash_val] for hash_val in unranked_pairs['hash1']])
+            h2 = np.array([hash_to_idx[hash_val] for hash_val in unranked_pairs['hash2']])
+            counts = np.zeros(len(all_hashes), dtype=np.int64)
+            alive = np.ones(len(h1), dtype=bool)
+            rng = np.random.default_rng()
+
+            # Greedily pick the remaining pair whose hashes were seen the least,
+            # breaking ties at random
+            order = []
+            for _ in range(len(h1)):
+                scores = counts[h1] + counts[h2]
+                scores[~alive] = np.iinfo(scores.dtype).max
+                candidates = np.flatnonzero(scores == scores.min())
+                chosen = candidates[rng.integers(len(candidates))]
+                order.append(chosen)
+                counts[h1[chosen]] += 1
+                counts[h2[chosen]] += 1
+                alive[chosen] = False
+
+            ordered_pairs = unranked_pairs.iloc[order].reset_index(drop=True)
+
+        self.pairs_df = pd.concat([ordered_pairs, self.pairs_df[self.pairs_df['winner'].notna()]], ignore_index=True).reset_index(drop=True)
+        self._rebuild_pair_index()  # row positions changed
+        self._dirty = True
         self.save()
 
     def save(self):
-        """Save the pairs to the CSV file."""
-        self.pairs_df.to_csv(self.pairs_path, index=False)
+        """Save the pairs to the Parquet file, if there are unsaved changes."""
+        if self._dirty and self._autosave:
+            _atomic_write(self.pairs_df, self.pairs_path)
+            self._dirty = False
+
+    def flush(self):
+        """Write any unsaved changes to disk, regardless of the autosave setting."""
+        if self._dirty:
+            _atomic_write(self.pairs_df, self.pairs_path)
+            self._dirty = False
+
+    @contextmanager
+    def batch(self):
+        """Context manager suppressing intermediate saves; writes once on exit."""
+        self._autosave = False
+        try:
+            yield self
+        finally:
+            self._autosave = True
+            self.save()
     
     def add_pairs(self, pairs: List[Tuple[str, str]], winners: Optional[List[float]] = None):
         """
@@ -317,90 +518,104 @@ class PairsManager:
             winners: Optional list of winner values (0 for hash1, 1 for hash2, 0.5 for draw)
         """
         if not pairs:
-            self._reindex_pairs()
+            self._reindex_dirty = True
             return
 
-        effective_winners = [None] * len(pairs) if winners is None else winners
-        if len(pairs) != len(effective_winners):
-            raise ValueError("Length of pairs and winners must match.")
-
-        input_df = pd.DataFrame(pairs, columns=['p_hash1', 'p_hash2'])
-        input_df['p_winner'] = effective_winners
-        input_df['p_id'] = input_df.index # Unique ID for each input pair
-
-        # Use a temporary column for original index of self.pairs_df.
-        # This helps in updating the correct rows in self.pairs_df.
-        temp_df_indices_col = '__original_df_idx__'
-        df_with_orig_idx = self.pairs_df.reset_index().rename(columns={'index': temp_df_indices_col})
-
-        # Update existing pairs that match (hash1, hash2) order
-        merged_fwd = pd.merge(
-            df_with_orig_idx, input_df, 
-            left_on=['hash1', 'hash2'], 
-            right_on=['p_hash1', 'p_hash2'], 
-            how='inner'
-        )
-
-        if not merged_fwd.empty:
-            update_map_fwd = pd.Series(merged_fwd['p_winner'].values, index=merged_fwd[temp_df_indices_col])
-            self.pairs_df.update(pd.Series(update_map_fwd, name='winner'))
-        
-        processed_p_ids = set(merged_fwd['p_id'].unique())
-
-        # Update existing pairs that match (hash2, hash1) order
-        remaining_input_df = input_df[~input_df['p_id'].isin(processed_p_ids)]
-        if not remaining_input_df.empty:
-            merged_bwd = pd.merge(
-                df_with_orig_idx, remaining_input_df,
+        if winners is None:
+            effective_winners = np.full(len(pairs), np.nan)
+        else:
+            if len(pairs) != len(winners):
+                raise ValueError("Length of pairs and winners must match.")
+            # Float array with NaN as the missing marker, so winner arithmetic stays vectorized
+            effective_winners = np.array([np.nan if w is None else w for w in winners], dtype=np.float64)
+
+        if len(pairs) <= self._MERGE_BATCH_THRESHOLD:
+            # Small batches: O(1) lookups in the canonical pair index beat two
+            # hash joins over the whole pairs table
+            processed_p_ids = set()
+            for p_id, (hash1, hash2) in enumerate(pairs):
+                key = (hash1, hash2) if hash1 < hash2 else (hash2, hash1)
+                idx = self._pair_idx.get(key)
+                if idx is None:
+                    continue
+                winner = effective_winners[p_id]
+                # Re-adding an existing pair without a winner must not clear its ranking
+                if not np.isnan(winner):
+                    self.pairs_df.at[idx, 'winner'] = \
+                        winner if self.pairs_df.at[idx, 'hash1'] == hash1 else 1.0 - winner
+                processed_p_ids.add(p_id)
+        else:
+            input_df = pd.DataFrame(pairs, columns=['p_hash1', 'p_hash2'])
+            input_df['p_winner'] = effective_winners
+            input_df['p_id'] = input_df.index # Unique ID for each input pair
+
+            # Use a temporary column for original index of self.pairs_df.
+            # This helps in updating the correct rows in self.pairs_df.
+            temp_df_indices_col = '__original_df_idx__'
+            df_with_orig_idx = self.pairs_df.reset_index().rename(columns={'index': temp_df_indices_col})
+
+            # Update existing pairs that match (hash1, hash2) order
+            merged_fwd = pd.merge(
+                df_with_orig_idx, input_df,
                 left_on=['hash1', 'hash2'],
-                right_on=['p_hash2', 'p_hash1'], # Note swapped columns
+                right_on=['p_hash1', 'p_hash2'],
                 how='inner'
             )
-            if not merged_bwd.empty:
-                bwd_adjusted_winners = merged_bwd['p_winner'].apply(
-                    lambda w: (1.0 - w) if isinstance(w, (float, int)) else None
-                )
-                update_map_bwd = pd.Series(bwd_adjusted_winners.values, index=merged_bwd[temp_df_indices_col])
-                self.pairs_df.update(pd.Series(update_map_bwd, name='winner'))
-                processed_p_ids.update(merged_bwd['p_id'].unique())
-
-        # Add new pairs
-        new_pairs_to_add_df = input_df[~input_df['p_id'].isin(processed_p_ids)]
-        if not new_pairs_to_add_df.empty:
-            # Prepare for canonicalization: select relevant columns and copy
-            temp_new_pairs = new_pairs_to_add_df[['p_hash1', 'p_hash2', 'p_winner']].copy()
-
-            # Apply canonicalization: ensure p_hash1 <= p_hash2
-            # Create mask for rows where p_hash1 > p_hash2
-            mask_swap = temp_new_pairs['p_hash1'] > temp_new_pairs['p_hash2']
-            
-            # Store original p_hash1 for swapped rows to correctly assign to p_hash2
-            original_p_hash1_for_swapped = temp_new_pairs.loc[mask_swap, 'p_hash1']
-            
-            # Perform swap for p_hash1 and p_hash2 where needed
-            temp_new_pairs.loc[mask_swap, 'p_hash1'] = temp_new_pairs.loc[mask_swap, 'p_hash2']
-            temp_new_pairs.loc[mask_swap, 'p_hash2'] = original_p_hash1_for_swapped
-            
-            # Adjust winner for swapped rows
-            temp_new_pairs.loc[mask_swap, 'p_winner'] = temp_new_pairs.loc[mask_swap, 'p_winner'].apply(
-                lambda w: (1.0 - w) if isinstance(w, (float, int)) else None
-            )
-            
-            # Rename columns to final schema ('hash1', 'hash2', 'winner')
-            temp_new_pairs.rename(columns={'p_hash1': 'hash1', 'p_hash2': 'hash2', 'p_winner': 'winner'}, inplace=True)
-            
-            # Deduplicate based on canonical (hash1, hash2), keeping the last occurrence
-            # from the input batch (implicit by current DataFrame row order which preserves input order).
-            final_new_rows = temp_new_pairs.drop_duplicates(subset=['hash1', 'hash2'], keep='last')
 
-            # deduplicate based on hash1 and hash2 such that hash1 != hash2
-            final_new_rows = final_new_rows[final_new_rows['hash1'] != final_new_rows['hash2']]
-            
-            # Concatenate the unique, canonical new pairs, if any remain after deduplication
-            if not final_new_rows.empty:
-                self.pairs_df = pd.concat([self.pairs_df, final_new_rows], ignore_index=True)
-        
-        self._reindex_pairs() # This method calls self.save()
+            if not merged_fwd.empty:
+                # Only assign rows with an actual winner: re-adding an existing pair
+                # without a winner must not clear its ranking
+                fwd_winners = merged_fwd['p_winner'].astype(float).to_numpy()
+                has_winner = ~np.isnan(fwd_winners)
+                self.pairs_df.loc[merged_fwd[temp_df_indices_col].to_numpy()[has_winner], 'winner'] = \
+                    fwd_winners[has_winner]
+
+            processed_p_ids = set(merged_fwd['p_id'].unique())
+
+            # Update existing pairs that match (hash2, hash1) order
+            remaining_input_df = input_df[~input_df['p_id'].isin(processed_p_ids)]
+            if not remaining_input_df.empty:
+                merged_bwd = pd.merge(
+                    df_with_orig_idx, remaining_input_df,
+                    left_on=['hash1', 'hash2'],
+                    right_on=['p_hash2', 'p_hash1'], # Note swapped columns
+                    how='inner'
+                )
+                if not merged_bwd.empty:
+                    # Invert the winner for pairs stored in the opposite order, skipping
+                    # winnerless re-adds as in the forward branch
+                    bwd_winners = 1.0 - merged_bwd['p_winner'].astype(float).to_numpy()
+                    has_winner = ~np.isnan(bwd_winners)
+                    self.pairs_df.loc[merged_bwd[temp_df_indices_col].to_numpy()[has_winner], 'winner'] = \
+                        bwd_winners[has_winner]
+                    processed_p_ids.update(merged_bwd['p_id'].unique())
+
+        # Add new pairs: canonicalize and deduplicate (keeping the last occurrence
+        # from the input batch) through a dict keyed by the canonical pair
+        new_rows = {}
+        for p_id, (hash1, hash2) in enumerate(pairs):
+            if p_id in processed_p_ids or hash1 == hash2:
+                continue
+            winner = effective_winners[p_id]
+            if hash1 > hash2:
+                hash1, hash2 = hash2, hash1
+                winner = 1.0 - winner  # NaN stays NaN
+            new_rows[(hash1, hash2)] = winner
+
+        if new_rows:
+            final_new_rows = pd.DataFrame(
+                [(hash1, hash2, winner) for (hash1, hash2), winner in new_rows.items()],
+                columns=['hash1', 'hash2', 'winner']
+            ).astype({'hash1': _STRING_DTYPE, 'hash2': _STRING_DTYPE, 'winner': 'float64'})
+            next_pos = len(self.pairs_df)
+            self.pairs_df = pd.concat([self.pairs_df, final_new_rows], ignore_index=True)
+            for offset, key in enumerate(new_rows):
+                self._pair_idx[key] = next_pos + offset
+
+        # Defer the O(U^2) reordering until someone actually fetches the next pair
+        self._reindex_dirty = True
+        self._dirty = True
+        self.save()
     
     def _get_unranked_pairs(self) -> pd.DataFrame:
         """Get all unranked pairs (where winner is null)."""
@@ -421,15 +636,14 @@ class PairsManager:
         """
         if winner < 0 or winner > 1:
             raise ValueError(f"Winner ({winner}) must be a float in [0, 1]")
-        
-        # Find the pair
-        pair_idx = self.pairs_df[
-            ((self.pairs_df['hash1'] == hash1) & (self.pairs_df['hash2'] == hash2)) |
-            ((self.pairs_df['hash1'] == hash2) & (self.pairs_df['hash2'] == hash1))
-        ].index
-        
-        if len(pair_idx) > 0:
-            self.pairs_df.at[pair_idx[0], 'winner'] = winner if self.pairs_df.at[pair_idx[0], 'hash1'] == hash1 else 1 - winner
+
+        # Find the pair through the canonical-key index
+        key = (hash1, hash2) if hash1 < hash2 else (hash2, hash1)
+        idx = self._pair_idx.get(key)
+
+        if idx is not None:
+            self.pairs_df.at[idx, 'winner'] = winner if self.pairs_df.at[idx, 'hash1'] == hash1 else 1 - winner
+            self._dirty = True
         else:
             self.add_pairs([(hash1, hash2)], [winner])
     
@@ -439,29 +653,34 @@ class PairsManager:
 
     def get_nb_unranked_pairs(self) -> int:
         """Get the number of unranked pairs."""
-        return self._get_unranked_pairs().shape[0]
-    
+        return int(self.pairs_df['winner'].isnull().sum())
+
     def get_nb_ranked_pairs(self) -> int:
         """Get the number of ranked pairs."""
-        return self._get_ranked_pairs().shape[0]
-    
+        return int(self.pairs_df['winner'].notnull().sum())
+
     def get_nb_pairs(self) -> int:
         """Get the total number of pairs."""
         return self.pairs_df.shape[0]
 
     def get_next_unranked_pair(self) -> Tuple[str, str]:
         """Get the next unranked pair."""
-        unranked_pairs = self._get_unranked_pairs()
-        if unranked_pairs.empty:
+        if self._reindex_dirty:
+            self._reindex_pairs()
+            self._reindex_dirty = False
+        mask = self.pairs_df['winner'].isnull()
+        if not mask.any():
             return None, None
-        return unranked_pairs.iloc[0]['hash1'], unranked_pairs.iloc[0]['hash2']
-    
+        row = self.pairs_df.loc[mask.idxmax()]
+        return row['hash1'], row['hash2']
+
     def get_last_ranked_pair(self) -> Tuple[str, str]:
         """Get the last ranked pair."""
-        ranked_pairs = self._get_ranked_pairs()
-        if ranked_pairs.empty:
+        mask = self.pairs_df['winner'].notnull()
+        if not mask.any():
             return None, None
-        return ranked_pairs.iloc[-1]['hash1'], ranked_pairs.iloc[-1]['hash2']
+        row = self.pairs_df.loc[mask[::-1].idxmax()]
+        return row['hash1'], row['hash2']
 
 class TrainingDataset:
     """
@@ -477,24 +696,14 @@ class TrainingDataset:
             dataset_manager: The dataset manager
         """        
         ranked_pairs = pairs_manager._get_ranked_pairs()
-        
-        # Prepare the data
-        self.data = []
-        self.simulations = set()
-        for _, row in ranked_pairs.iterrows():
-            hash1 = row['hash1']
-            hash2 = row['hash2']
 
-            winner = float(row['winner'])
+        # Prepare the data: resolve all output paths in two bulk lookups
+        output_paths1 = dataset_manager.get_output_paths(ranked_pairs['hash1'].tolist())
+        output_paths2 = dataset_manager.get_output_paths(ranked_pairs['hash2'].tolist())
+        winners = ranked_pairs['winner'].astype(float).tolist()
+        self.data = list(zip(output_paths1, output_paths2, winners))
 
-            self.simulations.add(hash1)
-            self.simulations.add(hash2)
-            
-            # Get the output paths
-            output_path1 = dataset_manager.get_output_paths([hash1])[0]
-            output_path2 = dataset_manager.get_output_paths([hash2])[0]
-            
-            self.data.append((output_path1, output_path2, winner))
+        self.simulations = set(pd.concat([ranked_pairs['hash1'], ranked_pairs['hash2']]).unique().tolist())
         self.simulations_number = len(self.simulations)
 
     def get_simulations_hashes(self) -> List[str]:
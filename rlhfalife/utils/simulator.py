@@ -116,7 +116,7 @@ class Simulator:
                       batch_size: int = None, verbose: bool = False, progress_callback: Callable[[str], bool] = None) -> bool:
         """
         Generate pairs of simulations to be ranked.
-        Add the new simulations to the pairs.csv for all possible pairs, including existing ones.
+        Add the new simulations to the pairs file for all possible pairs, including existing ones.
         
         Args:
             nb_params: Total number of parameters to generate
@@ -140,59 +140,60 @@ class Simulator:
         num_batches = (nb_params + batch_size - 1) // batch_size # Calculate number of batches, ceiling division
         
         all_generated_hashes = []
-        for batch_num in range(num_batches):
-            current_batch_size = min(batch_size, nb_params - (batch_num * batch_size))
-            if current_batch_size <= 0:
-                break
-
-            report_progress(f"Processing Batch {batch_num + 1}/{num_batches} (Size: {current_batch_size})...")
-
-            # Generate parameters
-            report_progress(f"  Generating {current_batch_size} parameters...")
-            params = self.generator.generate(current_batch_size)
-
-            # check if two params are the same
-            if any(str(params[i]) == str(params[j]) for i in range(len(params)) for j in range(i+1, len(params))):
-                print("\n" + "="*50)
-                print("!!! WARNING !!!: Generator generated at least two identical parameters within a batch.")
-                # filter out the identical parameters
-                unique_params_in_batch = []
-                seen_params_str = set()
-                for p in params:
-                    p_str = str(p)
-                    if p_str not in seen_params_str:
-                        unique_params_in_batch.append(p)
-                        seen_params_str.add(p_str)
-                params = unique_params_in_batch
-                print(f"  Unique parameters in this batch: {len(params)}, over {current_batch_size} generated.")
-                print("="*50 + "\n")
+        with dataset_manager.batch():
+            for batch_num in range(num_batches):
+                current_batch_size = min(batch_size, nb_params - (batch_num * batch_size))
+                if current_batch_size <= 0:
+                    break
+
+                report_progress(f"Processing Batch {batch_num + 1}/{num_batches} (Size: {current_batch_size})...")
+
+                # Generate parameters
+                report_progress(f"  Generating {current_batch_size} parameters...")
+                params = self.generator.generate(current_batch_size)
+
+                # check if two params are the same
+                if any(str(params[i]) == str(params[j]) for i in range(len(params)) for j in range(i+1, len(params))):
+                    print("\n" + "="*50)
+                    print("!!! WARNING !!!: Generator generated at least two identical parameters within a batch.")
+                    # filter out the identical parameters
+                    unique_params_in_batch = []
+                    seen_params_str = set()
+                    for p in params:
+                        p_str = str(p)
+                        if p_str not in seen_params_str:
+                            unique_params_in_batch.append(p)
+                            seen_params_str.add(p_str)
+                    params = unique_params_in_batch
+                    print(f"  Unique parameters in this batch: {len(params)}, over {current_batch_size} generated.")
+                    print("="*50 + "\n")
             
-            if not params: # if all params in batch were duplicates or batch size was 0
-                report_progress(f"  Skipping Batch {batch_num + 1} due to no unique parameters.")
-                continue
+                if not params: # if all params in batch were duplicates or batch size was 0
+                    report_progress(f"  Skipping Batch {batch_num + 1} due to no unique parameters.")
+                    continue
 
-            hashs = [str(h) for h in self.generator.hash_params(params)]
-            all_generated_hashes.extend(hashs)
+                hashs = [str(h) for h in self.generator.hash_params(params)]
+                all_generated_hashes.extend(hashs)
 
-            # Run simulations
-            report_progress(f"  Running {len(params)} simulations...")
-            outputs = self.run(params)
+                # Run simulations
+                report_progress(f"  Running {len(params)} simulations...")
+                outputs = self.run(params)
 
-            # Save parameters
-            report_progress("  Saving parameters...")
-            param_paths = self.save_params(hashs, params, dataset_manager.out_paths['params'])
+                # Save parameters
+                report_progress("  Saving parameters...")
+                param_paths = self.save_params(hashs, params, dataset_manager.out_paths['params'])
             
-            # Save outputs
-            report_progress("  Saving outputs...")
-            output_paths = self.save_outputs(hashs, outputs, dataset_manager.out_paths['outputs'])
+                # Save outputs
+                report_progress("  Saving outputs...")
+                output_paths = self.save_outputs(hashs, outputs, dataset_manager.out_paths['outputs'])
 
-            # Save videos
-            report_progress(f"  Generating and saving {len(outputs)} videos...")
-            video_paths = self.save_videos(hashs, outputs, dataset_manager.out_paths['videos'])
+                # Save videos
+                report_progress(f"  Generating and saving {len(outputs)} videos...")
+                video_paths = self.save_videos(hashs, outputs, dataset_manager.out_paths['videos'])
 
-            # Add entries to dataset manager
-            report_progress(f"  Adding {len(hashs)} entries to dataset manager...")
-            dataset_manager.add_entries_from_simulation(hashs, params, outputs, param_paths, output_paths, video_paths)
+                # Add entries to dataset manager
+                report_progress(f"  Adding {len(hashs)} entries to dataset manager...")
+                dataset_manager.add_entries_from_simulation(hashs, params, outputs, param_paths, output_paths, video_paths)
 
         if not all_generated_hashes:
             report_progress("No new simulations were generated (possibly all were duplicates or nb_params was 0).")